@@ -1,30 +1,91 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, make_response
+from flask_session import Session
+from cachelib.file import FileSystemCache
 from cs50 import SQL
-from PyPDF2 import PdfReader
 from werkzeug.utils import secure_filename
-from werkzeug.security import check_password_hash, generate_password_hash
-from functools import wraps
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from functools import lru_cache, wraps
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fcntl
+import hashlib
+import multiprocessing
 import os
 import random
+import sqlite3
+import threading
+from contextlib import closing
+from urllib.parse import quote
 
-from ml_model import train_model, score_text
+from ml_model import compact_text, model_version, train_model, score_text
+from pdf_text import extract_pdf_text
 
 
 UPLOAD_FOLDER = "uploads"
-ALLOWED_EXTENSIONS = {"pdf"}
+DATABASE = "resumemash.db"
+
+# Give up on parsing a single PDF after this many seconds
+PARSE_TIMEOUT = 20
+
+# Password hashing: argon2 with a fixed, deliberately chosen work factor
+# (roughly 50 ms per hash on a typical server) instead of werkzeug's defaults
+PH = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=2)
+
+# Prime modulus for the per-session swipe shuffle: (id * seed) % SWIPE_ORDER_PRIME
+# gives every resume id below it a distinct sort key, i.e. a random permutation
+SWIPE_ORDER_PRIME = 1000003
+ALLOWED_EXTENSIONS = frozenset({"pdf"})
+ALLOWED_SUFFIXES = tuple(f".{ext}" for ext in ALLOWED_EXTENSIONS)
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "dev"  # session signing key (fine for demo)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB max upload size
 
+# Let the front-end web server send uploaded PDFs instead of a Python worker.
+# - Apache (mod_xsendfile): set RESUMEMASH_X_SENDFILE=1
+# - nginx: set RESUMEMASH_X_ACCEL_PREFIX to an internal location that aliases
+#   uploads/, e.g. "/protected/" with `location /protected/ { internal; alias uploads/; }`
+# Neither is set for the dev server, which serves files itself.
+app.config["USE_X_SENDFILE"] = os.environ.get("RESUMEMASH_X_SENDFILE") == "1"
+app.config["X_ACCEL_PREFIX"] = os.environ.get("RESUMEMASH_X_ACCEL_PREFIX")
+
+# Keep session data on the server (like in Finance); the browser cookie only
+# carries a session id instead of the whole signed session dict
+app.config["SESSION_TYPE"] = "cachelib"
+app.config["SESSION_CACHELIB"] = FileSystemCache(cache_dir="flask_session", threshold=5000)
+app.config["SESSION_PERMANENT"] = False
+Session(app)
+
 # Make sure uploads folder exists so we can save PDFs there
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
 # Database setup
 
+# Gunicorn starts several worker processes at once, and each one imports this
+# file. An exclusive lock on a small lock file makes them run the setup below
+# one at a time instead of fighting over SQLite's write lock; only the first
+# one has real work to do, the rest find everything already in place.
+setup_lock = open(f"{DATABASE}.lock", "w")
+fcntl.flock(setup_lock, fcntl.LOCK_EX)
+
+# Switch the database to write-ahead logging so each write costs one append
+# instead of a rollback-journal round trip. WAL is remembered by the database
+# file itself, so a plain sqlite3 connection is enough here (CS50's helper wraps
+# every statement in a transaction, and SQLite refuses to change modes inside one).
+with closing(sqlite3.connect(DATABASE)) as conn:
+    conn.execute("PRAGMA journal_mode=WAL")
+
 # Use CS50’s SQL helper with a SQLite database file
-db = SQL("sqlite:///resumemash.db")
+db = SQL(f"sqlite:///{DATABASE}")
+
+# Create/upgrade all tables and indexes in one transaction so startup pays
+# for a single commit. IMMEDIATE takes the write lock up front, so another
+# process starting at the same time waits for it instead of failing with
+# "database is locked" when both try to upgrade to a write.
+db.execute("BEGIN IMMEDIATE")
 
 # Users table:
 # - username + password hash for auth
@@ -48,6 +109,9 @@ db.execute("""
 # - filename for the PDF
 # - extracted text content
 # - job_field: what type of role this resume is targeting
+# - text_sha256: hash of the extracted text, used for duplicate checks
+# - last_score / last_score_version: most recent "Mash" probability and the
+#   model_version() it came from, so /feedback can skip re-scoring
 db.execute("""
     CREATE TABLE IF NOT EXISTS resumes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,38 +119,322 @@ db.execute("""
         filename TEXT NOT NULL,
         text TEXT NOT NULL,
         job_field TEXT NOT NULL DEFAULT 'unspecified',
-        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        text_sha256 TEXT,
+        last_score REAL,
+        last_score_version INTEGER
     )
 """)
 
-# If resumes table already existed without job_field, add it
-try:
-    db.execute("SELECT job_field FROM resumes LIMIT 1")
-except Exception:
-    db.execute("ALTER TABLE resumes ADD COLUMN job_field TEXT NOT NULL DEFAULT 'unspecified'")
+# PDF text cache table:
+# - sha: SHA-256 of the uploaded PDF bytes
+# - text: text we already extracted from that exact file
+# Lets re-uploads of the same PDF (by anyone) skip parsing it again.
+db.execute("""
+    CREATE TABLE IF NOT EXISTS pdf_text_cache (
+        sha TEXT PRIMARY KEY,
+        text TEXT NOT NULL
+    )
+""")
 
 # Swipes table:
 # - one row per recruiter swipe
 # - label: 1 = like / Mash, 0 = pass
 # - used as training data for ML model
+# - created_at: Unix time in seconds (a small integer instead of a ~20-byte
+#   timestamp string, since nothing reads it on the hot path)
 db.execute("""
     CREATE TABLE IF NOT EXISTS swipes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         resume_id INTEGER NOT NULL,
         user_id INTEGER,
         label INTEGER NOT NULL, -- 1 = like, 0 = pass
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    )
+""")
+
+# Field swipe counts table:
+# - running number of swipes per job_field
+# - lets /swipe decide when to retrain without counting every swipe each time
+db.execute("""
+    CREATE TABLE IF NOT EXISTS field_swipe_counts (
+        field TEXT PRIMARY KEY,
+        n INTEGER NOT NULL DEFAULT 0
     )
 """)
 
+# Add any resumes columns that an older database is missing. One metadata
+# lookup tells us which columns exist, instead of probing each with a SELECT.
+resume_columns = {
+    row["name"] for row in db.execute("SELECT name FROM pragma_table_info('resumes')")
+}
+if "job_field" not in resume_columns:
+    db.execute("ALTER TABLE resumes ADD COLUMN job_field TEXT NOT NULL DEFAULT 'unspecified'")
+if "text_sha256" not in resume_columns:
+    db.execute("ALTER TABLE resumes ADD COLUMN text_sha256 TEXT")
+if "last_score" not in resume_columns:
+    db.execute("ALTER TABLE resumes ADD COLUMN last_score REAL")
+if "last_score_version" not in resume_columns:
+    db.execute("ALTER TABLE resumes ADD COLUMN last_score_version INTEGER")
+
+# Fill in text_sha256 for any rows stored before the column existed
+missing = db.execute("SELECT id, text FROM resumes WHERE text_sha256 IS NULL")
+for row in missing:
+    db.execute(
+        "UPDATE resumes SET text_sha256 = ? WHERE id = ?",
+        hashlib.sha256(row["text"].encode()).hexdigest(),
+        row["id"],
+    )
+
+# Indexes for the lookups our routes run on every request:
+# - resumes by job_field (swipe order, retraining join)
+# - a candidate's latest resume (feedback)
+# - resumes by filename (serving uploaded PDFs)
+# - resumes by user + field + text hash (duplicate upload check)
+# - resumes by text hash alone (cached feedback scores)
+# - swipes by resume + recruiter, unique so a recruiter can only swipe a
+#   resume once (also serves the retraining join; created further down)
+db.execute("CREATE INDEX IF NOT EXISTS idx_resumes_field ON resumes (job_field)")
+db.execute("CREATE INDEX IF NOT EXISTS idx_resumes_user_uploaded ON resumes (user_id, uploaded_at DESC, id DESC)")
+db.execute("CREATE INDEX IF NOT EXISTS idx_resumes_filename ON resumes (filename)")
+db.execute("CREATE INDEX IF NOT EXISTS idx_resumes_dup ON resumes (user_id, job_field, text_sha256)")
+db.execute("CREATE INDEX IF NOT EXISTS idx_resumes_sha ON resumes (text_sha256)")
+
+# One-time upgrade to unique swipes: the first time, before the unique index
+# can be created, drop any duplicate swipes (keeping each recruiter's first
+# swipe on a resume) and recount the affected fields. Once uq_swipes exists
+# there can't be duplicates, so later startups skip this whole scan.
+has_unique_swipes = db.execute(
+    "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_swipes'"
+)
+if not has_unique_swipes:
+    duplicate_fields = [
+        row["job_field"]
+        for row in db.execute("""
+            SELECT DISTINCT resumes.job_field
+            FROM swipes
+            JOIN resumes ON swipes.resume_id = resumes.id
+            WHERE swipes.id NOT IN (SELECT MIN(id) FROM swipes GROUP BY resume_id, user_id)
+        """)
+    ]
+    if duplicate_fields:
+        db.execute("DELETE FROM swipes WHERE id NOT IN (SELECT MIN(id) FROM swipes GROUP BY resume_id, user_id)")
+        db.execute(
+            """
+            UPDATE field_swipe_counts
+            SET n = (
+                SELECT COUNT(*)
+                FROM swipes
+                JOIN resumes ON swipes.resume_id = resumes.id
+                WHERE resumes.job_field = field_swipe_counts.field
+            )
+            WHERE field IN (?)
+            """,
+            duplicate_fields,
+        )
+    db.execute("DROP INDEX IF EXISTS idx_swipes_resume_user")
+    db.execute("CREATE UNIQUE INDEX uq_swipes ON swipes (resume_id, user_id)")
+
+# Seed swipe counters from existing swipes, but only while the counters table
+# is still empty (e.g. the first run after it was added). After that the swipe
+# route keeps them up to date, so there's no need to count every swipe again
+# on each startup.
+if not db.execute("SELECT 1 FROM field_swipe_counts LIMIT 1"):
+    db.execute("""
+        INSERT INTO field_swipe_counts (field, n)
+        SELECT resumes.job_field, COUNT(*)
+        FROM swipes
+        JOIN resumes ON swipes.resume_id = resumes.id
+        GROUP BY resumes.job_field
+    """)
+
+db.execute("COMMIT")
+
+# Setup done: let the next worker in
+setup_lock.close()
+
+
+# Background retraining:
+# - a single worker thread fits models so swipe requests never wait on scikit-learn
+# - fields already queued for retraining are not queued twice
+RETRAIN_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+retrain_lock = threading.Lock()
+queued_retrains = set()
+
+
+# PDF parsing pool:
+# - parsing is CPU-bound, so worker processes let several uploads parse in
+#   parallel instead of taking turns on one interpreter
+# - workers are started by a forkserver instead of being forked from this
+#   (multi-threaded) process; the server preloads pdf_text so they start fast
+# - the forkserver also re-imports the script Python was started with. Under
+#   Gunicorn or `flask run` that's their own script, so only pdf_text gets
+#   loaded, but with `python app.py` it imports app.py once more (like the
+#   debug reloader does), re-running the setup above in that process. That
+#   setup is safe to repeat, and the pool is only created by get_parse_pool()
+#   on the first upload, so the re-import doesn't start another pool.
+# - one parser per CPU core by default; under Gunicorn every web worker gets
+#   its own pool, so gunicorn.conf.py sets RESUMEMASH_PARSE_WORKERS to split
+#   the cores between them instead of starting cores × workers parsers
+PARSE_WORKERS = int(os.environ.get("RESUMEMASH_PARSE_WORKERS") or os.cpu_count())
+PARSE_CONTEXT = multiprocessing.get_context("forkserver")
+PARSE_CONTEXT.set_forkserver_preload(["pdf_text"])
+PARSE_POOL = None
+parse_pool_lock = threading.Lock()
+
 
 # Helpers
 
+def get_parse_pool():
+    """
+    Return the PDF parsing pool, creating it the first time it's needed.
+    """
+    global PARSE_POOL
+    with parse_pool_lock:
+        if PARSE_POOL is None:
+            PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=PARSE_CONTEXT)
+        return PARSE_POOL
+
+
+def replace_parse_pool(pool):
+    """
+    Drop pool so the next upload gets a fresh one, then stop pool's workers
+    (including any still stuck on a PDF) so they can't tie up later uploads.
+    """
+    global PARSE_POOL
+    with parse_pool_lock:
+        # Another request may have replaced this pool already
+        if PARSE_POOL is pool:
+            PARSE_POOL = None
+
+    # ProcessPoolExecutor has no public way to stop a busy worker, so
+    # terminate its processes directly (shutdown() forgets them)
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def parse_pdf(filepath):
+    """
+    Extract text from a PDF on the parsing pool, waiting at most PARSE_TIMEOUT seconds.
+    """
+    # Up to two tries: if another upload's stuck parse got the pool replaced
+    # while ours was running or waiting on it, our worker was killed along
+    # with it, but our PDF is fine, so parse it again on the new pool
+    for attempt in range(2):
+        pool = get_parse_pool()
+        try:
+            future = pool.submit(extract_pdf_text, filepath)
+            return future.result(timeout=PARSE_TIMEOUT)
+        except TimeoutError:
+            # Giving up only stops us waiting; the worker would keep parsing this
+            # PDF forever. Cancel it and replace the pool so its worker is killed,
+            # and let the caller treat this as a parse error
+            future.cancel()
+            replace_parse_pool(pool)
+            raise
+        except (BrokenProcessPool, CancelledError):
+            if attempt == 0 and PARSE_POOL is not pool:
+                continue
+            # A worker died (e.g. crashed on a malformed PDF); start a fresh pool
+            # so later uploads still work, and let the caller treat this as a parse error
+            replace_parse_pool(pool)
+            raise
+
+
 def allowed_file(filename):
     """
     Return True if filename has a valid extension (currently: only PDF).
     """
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
+
+
+@lru_cache(maxsize=4096)
+def cached_score(text_sha256, job_field, version):
+    """
+    Memoized score_text() for a resume, keyed by the hash of its text.
+
+    version comes from model_version(), so once a field's model is retrained
+    the key changes and stale scores are simply never looked up again.
+    """
+    rows = db.execute("SELECT text FROM resumes WHERE text_sha256 = ? LIMIT 1", text_sha256)
+    if not rows:
+        return None
+    return score_text(rows[0]["text"], job_field)
+
+
+def retrain_in_background(job_field, count):
+    """
+    Queue a retrain of job_field's model on the background worker.
+
+    If that field is already waiting in the queue, do nothing: the queued
+    run reads every swipe its model hasn't seen yet when it starts, so it
+    will include this one too.
+    """
+    with retrain_lock:
+        if job_field in queued_retrains:
+            return
+        queued_retrains.add(job_field)
+    RETRAIN_EXECUTOR.submit(_retrain, job_field, count)
+
+
+def _retrain(job_field, count):
+    """
+    Worker side of retrain_in_background(): train and log the result.
+    """
+    # Leave the queue before reading swipes, so any swipe after this point
+    # queues a fresh run instead of being silently skipped
+    with retrain_lock:
+        queued_retrains.discard(job_field)
+
+    try:
+        used = train_model(db, job_field)
+    except Exception as e:
+        print(f"[ML] Retraining failed for field '{job_field}':", e)
+        return
+    print(f"[ML] Retrained model for field '{job_field}' on {used} new swipes (field total: {count}).")
+
+
+def check_password(user, password):
+    """
+    Return True if password matches the user's stored hash.
+
+    New accounts use argon2. Older werkzeug hashes still verify, and get
+    upgraded to argon2 (with our current parameters) on successful login.
+    """
+    stored = user["hash"]
+    if stored.startswith("$argon2"):
+        try:
+            PH.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if not PH.check_needs_rehash(stored):
+            return True
+    elif not check_password_hash(stored, password):
+        return False
+
+    db.execute("UPDATE users SET hash = ? WHERE id = ?", PH.hash(password), user["id"])
+    return True
+
+
+@lru_cache(maxsize=1024)
+def get_user(user_id):
+    """
+    Return the id, username, and role for a user (or None), cached by id.
+
+    User rows don't change after registration, so the cache is only cleared
+    when a new account is created.
+    """
+    rows = db.execute("SELECT id, username, role FROM users WHERE id = ?", user_id)
+    return rows[0] if rows else None
+
+
+def current_role():
+    """
+    Return the logged-in user's role as stored in the database.
+    """
+    user = get_user(session.get("user_id"))
+    return user["role"] if user else None
 
 
 def login_required(f):
@@ -159,7 +507,7 @@ def register():
             return redirect(url_for("register"))
 
         # All good -> insert new user with hashed password
-        hash_ = generate_password_hash(password)
+        hash_ = PH.hash(password)
         db.execute(
             """
             INSERT INTO users (username, hash, role, first_name, last_name, email, phone)
@@ -174,6 +522,9 @@ def register():
             phone,
         )
 
+        # New row in users, so drop any cached lookups
+        get_user.cache_clear()
+
         # Immediately log the user in and store their info in the session
         user = db.execute("SELECT id, role FROM users WHERE username = ?", username)[0]
         session["user_id"] = user["id"]
@@ -210,7 +561,7 @@ def login():
         # Look up the user
         rows = db.execute("SELECT * FROM users WHERE username = ?", username)
         # Ensure exactly one match and that password hash matches
-        if len(rows) != 1 or not check_password_hash(rows[0]["hash"], password):
+        if len(rows) != 1 or not check_password(rows[0], password):
             flash("Invalid username and/or password.")
             return redirect(url_for("login"))
 
@@ -246,12 +597,13 @@ def upload():
     - Requires role == "candidate".
     - Accepts exactly one PDF file.
     - Requires a job_field from the dropdown.
-    - Extracts text using PyPDF2.
+    - Extracts text using PyMuPDF (cached by file hash).
     - Does a simple duplicate check (same user, text, and field).
-    - Inserts resume and redirects candidate to /feedback.
+    - Scores it with the field's current model, inserts resume (with score),
+      and redirects candidate to /feedback.
     """
     # Only candidates should upload resumes
-    if session.get("role") != "candidate":
+    if current_role() != "candidate":
         flash("Only candidates can upload resumes.")
         return redirect(url_for("index"))
 
@@ -279,49 +631,75 @@ def upload():
             flash("Only PDF files are allowed.")
             return redirect(url_for("upload"))
 
+        # All checks passed: only now read the upload and write it to disk.
+        # Hash the bytes on the way through so identical PDFs share one cached extraction.
+        data = resume_file.read()
+        digest = hashlib.sha256(data).hexdigest()
+
         # Save file to uploads/ with a secure filename
         filename = secure_filename(resume_file.filename)
         filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        resume_file.save(filepath)
+        with open(filepath, "wb") as f:
+            f.write(data)
 
-        # Extract text from the PDF
-        try:
-            reader = PdfReader(filepath)
-            text_parts = []
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-            full_text = "\n".join(text_parts).strip()
-        except Exception as e:
-            print("PDF parse error:", e)
-            full_text = ""
+        cached = db.execute("SELECT text FROM pdf_text_cache WHERE sha = ?", digest)
+        if cached:
+            full_text = cached[0]["text"]
+        else:
+            # Extract text from the PDF (in a worker process), keeping only
+            # the words the ML model uses
+            try:
+                full_text = compact_text(parse_pdf(filepath))
+            except Exception as e:
+                print("PDF parse error:", e)
+                full_text = ""
+
+            # Only remember real extractions, not parse failures
+            if full_text:
+                db.execute(
+                    "INSERT OR IGNORE INTO pdf_text_cache (sha, text) VALUES (?, ?)",
+                    digest,
+                    full_text,
+                )
 
         # Fallback if for some reason nothing can be extracted
         if not full_text:
             full_text = "(No text could be extracted from this PDF.)"
 
         user_id = session["user_id"]
+        text_sha256 = hashlib.sha256(full_text.encode()).hexdigest()
 
         # Duplicate check:
         # Same user, same extracted text, and same job_field → treat as duplicate.
+        # Compares text hashes so SQLite never has to compare full resume texts.
         existing = db.execute(
-            "SELECT id FROM resumes WHERE user_id = ? AND text = ? AND job_field = ?",
+            "SELECT id FROM resumes WHERE user_id = ? AND job_field = ? AND text_sha256 = ?",
             user_id,
-            full_text,
             job_field,
+            text_sha256,
         )
         if existing:
             flash("You already uploaded this resume for this job field. Try uploading an updated version instead.")
             return redirect(url_for("feedback"))
 
-        # Insert new resume with job_field
+        # Score it now against the field's current model, so /feedback can
+        # usually show the stored score without running the model again
+        version = model_version(job_field)
+        last_score = score_text(full_text, job_field) if version is not None else None
+
+        # Insert new resume with job_field and its score
         db.execute(
-            "INSERT INTO resumes (user_id, filename, text, job_field) VALUES (?, ?, ?, ?)",
+            """
+            INSERT INTO resumes (user_id, filename, text, job_field, text_sha256, last_score, last_score_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
             user_id,
             filename,
             full_text,
             job_field,
+            text_sha256,
+            last_score,
+            version,
         )
 
         flash("Resume uploaded!")
@@ -339,11 +717,12 @@ def swipe():
 
     - Requires role == "recruiter".
     - Uses a session-level job_field (set on /swipe/select).
-    - Builds a randomized order of resume IDs per field and stores it in session.
-    - On each POST, records a swipe and possibly retrains the ML model.
+    - Keeps a random seed + position in session; SQL turns the seed into a
+      shuffled order and fetches just the current resume.
+    - On each POST, records a swipe and possibly queues a retrain of the ML model.
     """
     # Only recruiters should swipe resumes
-    if session.get("role") != "recruiter":
+    if current_role() != "recruiter":
         flash("Only recruiters can swipe resumes.")
         return redirect(url_for("index"))
 
@@ -353,23 +732,27 @@ def swipe():
         flash("Please choose a job field first.")
         return redirect(url_for("swipe_select"))
 
-    # If we don't yet have a randomized order for this session, create one
-    if "swipe_order" not in session:
-        rows = db.execute(
-            "SELECT id FROM resumes WHERE job_field = ?",
+    # If we don't yet have a randomized order for this session, create one.
+    # Only the seed lives in the session cookie, not the whole list of IDs.
+    # We also remember the newest resume id at this point: resumes uploaded
+    # later would otherwise slot into the shuffled order and shift the
+    # position, so the recruiter would skip or repeat resumes.
+    # (Older sessions without swipe_max_id just start a new order.)
+    if "swipe_seed" not in session or "swipe_max_id" not in session:
+        max_id = db.execute(
+            "SELECT MAX(id) AS max_id FROM resumes WHERE job_field = ?",
             job_field,
-        )
-        if not rows:
+        )[0]["max_id"]
+        if max_id is None:
             flash("No resumes available yet for this field.")
             return redirect(url_for("swipe_select"))
 
-        # Build a list of resume IDs and shuffle them
-        order = [row["id"] for row in rows]
-        random.shuffle(order)
-        session["swipe_order"] = order
+        session["swipe_seed"] = random.randint(1, SWIPE_ORDER_PRIME - 1)
+        session["swipe_max_id"] = max_id
         session["swipe_index"] = 0
 
-    order = session["swipe_order"]
+    seed = session["swipe_seed"]
+    max_id = session["swipe_max_id"]
     index = session.get("swipe_index", 0)
 
     if request.method == "POST":
@@ -382,50 +765,40 @@ def swipe():
 
         recruiter_id = session["user_id"]
 
-        # Prevent duplicate swipes for the same resume by the same recruiter
-        existing_swipe = db.execute(
-            "SELECT id FROM swipes WHERE resume_id = ? AND user_id = ?",
+        # Record this swipe. The unique (resume_id, user_id) index makes SQLite
+        # ignore duplicate swipes for the same resume by the same recruiter,
+        # in which case no new row id comes back.
+        swipe_id = db.execute(
+            "INSERT OR IGNORE INTO swipes (resume_id, user_id, label) VALUES (?, ?, ?)",
             resume_id,
             recruiter_id,
+            label,
         )
-        if not existing_swipe:
-            # Record this swipe
-            db.execute(
-                "INSERT INTO swipes (resume_id, user_id, label) VALUES (?, ?, ?)",
-                resume_id,
-                recruiter_id,
-                label,
-            )
-
+        if swipe_id is not None:
             # Dynamic retraining:
             # Every 10 swipes *in this field*, retrain that field's model
-            count = db.execute(
+            # (on a background thread, so this request returns right away)
+            db.execute(
                 """
-                SELECT COUNT(*) AS n
-                FROM swipes
-                JOIN resumes ON swipes.resume_id = resumes.id
-                WHERE resumes.job_field = ?
+                INSERT INTO field_swipe_counts (field, n) VALUES (?, 1)
+                ON CONFLICT (field) DO UPDATE SET n = n + 1
                 """,
                 job_field,
+            )
+            count = db.execute(
+                "SELECT n FROM field_swipe_counts WHERE field = ?",
+                job_field,
             )[0]["n"]
 
             if count % 10 == 0:
-                used = train_model(db, job_field)
-                print(
-                    f"[ML] Retrained model for field '{job_field}' on {used} swipes (field total: {count})."
-                )
+                retrain_in_background(job_field, count)
 
         # Move to next resume in the randomized order
         index += 1
         session["swipe_index"] = index
 
-    # If we've gone through all resumes in this order, show the "done" page
-    if index >= len(order):
-        return render_template("swipe_done.html")
-
-    # Get the current resume by ID from the randomized order
-    current_resume_id = order[index]
-    resume = db.execute(
+    # Get the resume at our position in this session's shuffled order
+    rows = db.execute(
         """
         SELECT resumes.id,
                resumes.filename,
@@ -434,10 +807,26 @@ def swipe():
                users.last_name
         FROM resumes
         JOIN users ON resumes.user_id = users.id
-        WHERE resumes.id = ?
+        WHERE resumes.id = (
+            SELECT id
+            FROM resumes
+            WHERE job_field = ? AND id <= ?
+            ORDER BY (id * ?) % ?, id
+            LIMIT 1 OFFSET ?
+        )
         """,
-        current_resume_id,
-    )[0]
+        job_field,
+        max_id,
+        seed,
+        SWIPE_ORDER_PRIME,
+        index,
+    )
+
+    # If we've gone through all resumes in this order, show the "done" page
+    if not rows:
+        return render_template("swipe_done.html")
+
+    resume = rows[0]
 
     # Render swipe.html with current resume info
     return render_template("swipe.html", resume=resume)
@@ -450,9 +839,9 @@ def swipe_select():
     Page where recruiters pick which job field they want to swipe on.
 
     - Stores chosen field in session["swipe_field"].
-    - Resets any existing swipe order/index for that recruiter session.
+    - Resets any existing swipe seed/index for that recruiter session.
     """
-    if session.get("role") != "recruiter":
+    if current_role() != "recruiter":
         flash("Only recruiters can swipe resumes.")
         return redirect(url_for("index"))
 
@@ -476,9 +865,10 @@ def swipe_select():
         # Store chosen field in session
         session["swipe_field"] = chosen
 
-        # Reset swipe order + index for this newly selected field
-        session.pop("swipe_order", None)
+        # Reset swipe seed + index for this newly selected field
+        session.pop("swipe_seed", None)
         session.pop("swipe_index", None)
+        session.pop("swipe_max_id", None)
         return redirect(url_for("swipe"))
 
     # GET: show dropdown form
@@ -491,15 +881,16 @@ def swipe_reset():
     """
     Developer/admin helper route to reset swipe order for the current recruiter.
 
-    - Clears swipe_index and swipe_order from the session.
+    - Clears swipe_index, swipe_seed and swipe_max_id from the session.
     - Next visit to /swipe will rebuild a fresh randomized order.
     """
-    if session.get("role") != "recruiter":
+    if current_role() != "recruiter":
         flash("Only recruiters can reset swipes.")
         return redirect(url_for("index"))
 
     session.pop("swipe_index", None)
-    session.pop("swipe_order", None)
+    session.pop("swipe_seed", None)
+    session.pop("swipe_max_id", None)
     return redirect(url_for("swipe"))
 
 
@@ -522,14 +913,23 @@ def uploaded_file(filename):
 
     owner_id = rows[0]["user_id"]
     current_id = session.get("user_id")
-    role = session.get("role")
+    role = current_role()
 
     # Candidates can only view their own resume; recruiters can view all
     if role != "recruiter" and current_id != owner_id:
         flash("You do not have permission to view this resume.")
         return redirect(url_for("index"))
 
-    # Actually serve the file from the uploads directory
+    # Behind nginx: hand the file off with X-Accel-Redirect so nginx streams it
+    prefix = app.config["X_ACCEL_PREFIX"]
+    if prefix:
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(filename)
+        response.headers["Content-Type"] = "application/pdf"
+        return response
+
+    # Otherwise serve the file from the uploads directory
+    # (with USE_X_SENDFILE, Flask emits an X-Sendfile header for Apache instead)
     return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
 
 
@@ -540,7 +940,8 @@ def feedback():
     Candidate-only route that shows AI feedback for their most recent resume.
 
     - Finds the latest resume for this candidate.
-    - Uses score_text() to get a probability for "Mash" for that job_field.
+    - Gets the probability of "Mash" for that job_field: the score stored on
+      the resume if the model hasn't changed since, else score_text() (memoized).
     - Converts probability to a percentage and bucketed feedback message.
     - Renders feedback.html with:
         - resume preview
@@ -548,7 +949,7 @@ def feedback():
         - feedback text
     """
     # Only candidates should see feedback on their own resume
-    if session.get("role") != "candidate":
+    if current_role() != "candidate":
         flash("Only candidates can view resume feedback.")
         return redirect(url_for("index"))
 
@@ -557,7 +958,8 @@ def feedback():
     # Get this candidate's most recently uploaded resume (latest uploaded_at, then id)
     rows = db.execute(
         """
-        SELECT id, user_id, filename, text, job_field, uploaded_at
+        SELECT id, user_id, filename, job_field, uploaded_at, text_sha256,
+               last_score, last_score_version
         FROM resumes
         WHERE user_id = ?
         ORDER BY uploaded_at DESC, id DESC
@@ -572,8 +974,20 @@ def feedback():
 
     resume = rows[0]
 
-    # Run ML model to score this resume text for its job_field
-    raw_score = score_text(resume["text"], resume["job_field"])
+    # Use the score stored on the resume if it came from the field's current
+    # model; otherwise run the ML model (memoized) and store the fresh score
+    job_field = resume["job_field"]
+    version = model_version(job_field)
+    if resume["last_score_version"] == version:
+        raw_score = resume["last_score"]
+    else:
+        raw_score = cached_score(resume["text_sha256"], job_field, version)
+        db.execute(
+            "UPDATE resumes SET last_score = ?, last_score_version = ? WHERE id = ?",
+            raw_score,
+            version,
+            resume["id"],
+        )
     score_pct = None
     feedback_message = None
 
@@ -1,63 +1,151 @@
+import hashlib
+import io
 import os
+import re
 import shutil
+import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 
-from cs50 import SQL
+import ahocorasick
 from PyPDF2 import PdfReader
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash
 
-# SQLite connection string for the same DB your Flask app uses
-DB_URL = "sqlite:///resumemash.db"
+from ml_model import compact_text
+from pdf_text import MAX_RESUME_TEXT, extract_pdf_text_and_title
+
+# SQLite database file for the same DB your Flask app uses
+DB_PATH = "resumemash.db"
+
+# Buffer this many resumes, then insert them with one multi-row statement per
+# table and commit, so one transaction covers many inserts without growing
+# unbounded on huge ZIPs
+BATCH_SIZE = 500
 
 # Path to the ZIP file containing all resumes you want to bulk import
 ZIP_PATH = "bulk_resumes.zip"
 
-# Temporary directory where we’ll unpack the ZIP contents
-SOURCE_DIR = "bulk_resumes"
-
 # Directory where the Flask app expects to find resume PDFs
 UPLOAD_DIR = "uploads"
 
 
+# A whole word of letters only, between spaces/pipes (or the ends of the line),
+# e.g. "Jane" and "Doe" in "Jane Doe | jane@x.com" but not "jane@x.com"
+NAME_TOKEN = re.compile(r"(?<![^\s|])[^\W\d_]+(?![^\s|])")
+
+# Keywords that hint at each job field (matched as lowercase substrings).
+# Dict order matters: on a tie, the field listed first wins.
+JOB_FIELD_KEYWORDS = {
+    # Software / Engineering keywords
+    "software": [
+        "software engineer", "software developer", "developer", "programmer",
+        "python", "java", "c++", "c#", "javascript", "typescript", "react",
+        "node", "api", "backend", "front end", "frontend",
+        "computer science", "cs major", "git", "github",
+    ],
+    # Data / Analytics keywords
+    "data": [
+        "data scientist", "data science", "data analyst", "analytics",
+        "machine learning", "ml engineer", "pandas", "numpy", "sql",
+        "statistics", "regression", "tableau", "power bi", "ga4",
+    ],
+    # Finance keywords
+    "finance": [
+        "investment banking", "investment banker", "private equity",
+        "hedge fund", "trading", "trader", "financial analyst",
+        "equity research", "valuation", "dcf", "discounted cash flow",
+        "leveraged buyout", "lbo", "m&a", "capital markets",
+    ],
+    # Consulting keywords
+    "consulting": [
+        "consultant", "consulting", "strategy consultant", "management consulting",
+        "mckinsey", "bain", "bcg", "case interview", "client engagement",
+    ],
+    # Marketing keywords
+    "marketing": [
+        "marketing", "social media", "seo", "sem", "campaign", "digital ads",
+        "content creator", "brand", "branding", "advertising", "copywriting",
+    ],
+    # Product Management keywords
+    "product": [
+        "product manager", "product management", "product owner",
+        "product roadmap", "user stories", "requirements gathering",
+        "feature prioritization", "a/b test", "ab test", "user research",
+    ],
+}
+
+# Score added to a field for each of its keywords found in a resume
+KEYWORD_WEIGHT = 2
+
+# Which field(s) each keyword counts toward
+KEYWORD_FIELDS = {}
+for _field, _keywords in JOB_FIELD_KEYWORDS.items():
+    for _keyword in _keywords:
+        KEYWORD_FIELDS.setdefault(_keyword, []).append(_field)
+
+# Aho-Corasick automaton over every keyword, built once at import time, so
+# guess_job_field() scans the text a single time (in C) instead of running
+# one substring search per keyword
+KEYWORD_AUTOMATON = ahocorasick.Automaton()
+for _keyword in KEYWORD_FIELDS:
+    KEYWORD_AUTOMATON.add_word(_keyword, _keyword)
+KEYWORD_AUTOMATON.make_automaton()
+
+
+def _extract_with_pypdf2(path):
+    """
+    Fallback: extract (full_text, title) with PyPDF2.
+    """
+    reader = PdfReader(path)
+
+    # Extract text from all pages (up to the length cap)
+    buf = io.StringIO()
+    for page in reader.pages:
+        page_text = page.extract_text()
+        if page_text:
+            buf.write(page_text)
+            buf.write("\n")
+            if buf.tell() > MAX_RESUME_TEXT:
+                break
+    full_text = buf.getvalue().strip()
+
+    # Extract metadata title if available
+    title = ""
+    meta = getattr(reader, "metadata", None)
+    if meta:
+        # PyPDF2 3.x style: meta.title or fallback meta["/Title"]
+        if getattr(meta, "title", None):
+            title = str(meta.title)
+        elif "/Title" in meta:
+            title = str(meta["/Title"])
+    return full_text, title
+
+
 def extract_text_and_title(path):
     """
     Given a path to a PDF file, extract:
 
-      - full_text: all text from the PDF (concatenated across pages)
+      - full_text: all text from the PDF (concatenated across pages, stopping
+                   after the page that passes MAX_RESUME_TEXT characters)
       - title:     the PDF's metadata title, if present
 
+    Uses pdf_text's PyMuPDF extraction (same as app.py), falling back to
+    PyPDF2 if PyMuPDF can't read the file.
+
     Returns:
-      (full_text, title_str)
+      (full_text, title_str), with full_text "" if no text could be extracted
     """
-    full_text = ""
-    title = ""
-
     try:
-        reader = PdfReader(path)
-
-        # Extract text from all pages
-        text_parts = []
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-        full_text = "\n".join(text_parts).strip()
-
-        # Extract metadata title if available
-        meta = getattr(reader, "metadata", None)
-        if meta:
-            # PyPDF2 3.x style: meta.title or fallback meta["/Title"]
-            if getattr(meta, "title", None):
-                title = str(meta.title)
-            elif "/Title" in meta:
-                title = str(meta["/Title"])
+        full_text, title = extract_pdf_text_and_title(path)
     except Exception as e:
-        print(f"Error reading {path}: {e}")
-        full_text = ""
-
-    # If we couldn't get any text, store a placeholder
-    if not full_text:
-        full_text = "(No text could be extracted from this PDF.)"
+        print(f"PyMuPDF couldn't read {path} ({e}), trying PyPDF2...")
+        try:
+            full_text, title = _extract_with_pypdf2(path)
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            full_text, title = "", ""
 
     return full_text, (title or "")
 
@@ -76,13 +164,11 @@ def guess_name_from_text(text, fallback_filename):
       (first_name, last_name)
     """
     if text:
-        # Take all non-empty lines
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-        if lines:
-            # First line is often the candidate’s name
-            first_line = lines[0]
-            # Replace '|' separators and split into words, keep only alphabetic
-            parts = [p for p in first_line.replace("|", " ").split() if p.isalpha()]
+        # First non-empty line is often the candidate’s name
+        first_line = next((ln for ln in text.splitlines() if ln.strip()), None)
+        if first_line:
+            # Words split on spaces/pipes, keeping only alphabetic ones
+            parts = NAME_TOKEN.findall(first_line)
 
             # If it looks short enough to be a human name, use it
             if 1 <= len(parts) <= 4:
@@ -133,105 +219,106 @@ def guess_job_field(text, filename, pdf_title):
         return "general"
 
     # Initialize score buckets for each field
-    scores = {
-        "software": 0,
-        "data": 0,
-        "finance": 0,
-        "consulting": 0,
-        "marketing": 0,
-        "product": 0,
-    }
-
-    # Helper to increment scores when we see specific keywords
-    def bump(field, kws, weight=2):
-        for kw in kws:
-            if kw in combined:
-                scores[field] += weight
+    scores = {field: 0 for field in JOB_FIELD_KEYWORDS}
 
-    # Software / Engineering keywords
-    bump(
-        "software",
-        [
-            "software engineer", "software developer", "developer", "programmer",
-            "python", "java", "c++", "c#", "javascript", "typescript", "react",
-            "node", "api", "backend", "front end", "frontend",
-            "computer science", "cs major", "git", "github",
-        ],
-    )
+    # One pass over the text finds every keyword that appears in it;
+    # each keyword found bumps its field once, no matter how often it appears
+    found = {keyword for _, keyword in KEYWORD_AUTOMATON.iter(combined)}
+    for keyword in found:
+        for field in KEYWORD_FIELDS[keyword]:
+            scores[field] += KEYWORD_WEIGHT
 
-    # Data / Analytics keywords
-    bump(
-        "data",
-        [
-            "data scientist", "data science", "data analyst", "analytics",
-            "machine learning", "ml engineer", "pandas", "numpy", "sql",
-            "statistics", "regression", "tableau", "power bi", "ga4",
-        ],
-    )
+    # Choose the field with the highest score
+    best_field = max(scores, key=scores.get)
+    if scores[best_field] == 0:
+        # No field had any hits → default to 'general'
+        return "general"
+    return best_field
 
-    # Finance keywords
-    bump(
-        "finance",
-        [
-            "investment banking", "investment banker", "private equity",
-            "hedge fund", "trading", "trader", "financial analyst",
-            "equity research", "valuation", "dcf", "discounted cash flow",
-            "leveraged buyout", "lbo", "m&a", "capital markets",
-        ],
-    )
 
-    # Consulting keywords
-    bump(
-        "consulting",
-        [
-            "consultant", "consulting", "strategy consultant", "management consulting",
-            "mckinsey", "bain", "bcg", "case interview", "client engagement",
-        ],
-    )
+def insert_batch(conn, user_rows, resume_rows):
+    """
+    Insert a batch of buffered candidate users and their resumes.
 
-    # Marketing keywords
-    bump(
-        "marketing",
-        [
-            "marketing", "social media", "seo", "sem", "campaign", "digital ads",
-            "content creator", "brand", "branding", "advertising", "copywriting",
-        ],
+    Inputs:
+      conn        - sqlite3 connection (inside an open write transaction)
+      user_rows   - list of (username, hash, role, first_name, last_name, email, phone)
+      resume_rows - list of (filename, text, job_field, text_sha256), one per
+                    user row and in the same order
+    """
+    if not user_rows:
+        return
+
+    conn.executemany(
+        """
+        INSERT INTO users (username, hash, role, first_name, last_name, email, phone)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        user_rows,
     )
 
-    # Product Management keywords
-    bump(
-        "product",
-        [
-            "product manager", "product management", "product owner",
-            "product roadmap", "user stories", "requirements gathering",
-            "feature prioritization", "a/b test", "ab test", "user research",
-        ],
+    # Work out the new users' ids without looking them up. This only works
+    # because the users executemany above ran inside this connection's open
+    # write transaction: while we hold the write lock nobody else can insert,
+    # so SQLite gave our rows consecutive ids ending at the last inserted one.
+    # (Don't call this outside a transaction, e.g. in autocommit mode.)
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(user_rows) + 1
+
+    conn.executemany(
+        """
+        INSERT INTO resumes (user_id, filename, text, job_field, text_sha256)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(user_id, *row) for user_id, row in enumerate(resume_rows, start=first_id)],
     )
 
-    # Choose the field with the highest score
-    best_field = max(scores, key=scores.get)
-    if scores[best_field] == 0:
-        # No field had any hits → default to 'general'
-        return "general"
-    return best_field
+
+def prepare_database():
+    """
+    Make sure the database has the tables and columns this script writes to.
+
+    The Flask app creates the tables and adds newer columns when it starts,
+    but the import may run against an older database the app has not been
+    started on since. Missing columns are added the same way app.py does;
+    missing tables mean the app has never run, so we stop.
+
+    Returns True if the database is ready for the import.
+    """
+    with closing(sqlite3.connect(DB_PATH, isolation_level=None)) as conn:
+        tables = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        if "users" not in tables or "resumes" not in tables:
+            print(f"'{DB_PATH}' has no users/resumes tables. Start the app once first.")
+            return False
+
+        resume_columns = {
+            row[0] for row in conn.execute("SELECT name FROM pragma_table_info('resumes')")
+        }
+        if "job_field" not in resume_columns:
+            conn.execute("ALTER TABLE resumes ADD COLUMN job_field TEXT NOT NULL DEFAULT 'unspecified'")
+        if "text_sha256" not in resume_columns:
+            conn.execute("ALTER TABLE resumes ADD COLUMN text_sha256 TEXT")
+    return True
 
 
 def main():
     """
     Bulk import pipeline:
 
-      1. Connect to DB
-      2. Unpack ZIP of resume PDFs into a temp folder
-      3. For each PDF:
+      1. Check the DB schema (before touching uploads/)
+      2. Write each PDF in the ZIP straight into uploads/
+      3. Connect to DB
+      4. For each PDF:
           - extract text + metadata title
           - guess candidate name
           - guess job_field
-          - create a candidate user account
-          - copy the PDF into uploads/
-          - insert a resume row tied to that user and field
+          - queue a candidate user account
+          - queue a resume row tied to that user and field
+      5. Every BATCH_SIZE PDFs (and at the end), insert the queued
+         users + resumes in bulk and commit
     """
-    db = SQL(DB_URL)
-
     # Make sure uploads folder exists so Flask can serve the PDFs
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -240,106 +327,126 @@ def main():
         print(f"ZIP file '{ZIP_PATH}' not found.")
         return
 
-    # Clean out old SOURCE_DIR if it exists, then recreate it fresh
-    if os.path.isdir(SOURCE_DIR):
-        shutil.rmtree(SOURCE_DIR)
-    os.makedirs(SOURCE_DIR, exist_ok=True)
+    # Fail (or migrate) before any PDF lands in uploads/, so a bad database
+    # doesn't leave orphaned files behind
+    if not prepare_database():
+        return
 
-    print(f"Unpacking {ZIP_PATH} into {SOURCE_DIR}...")
-    # Unpack everything in the ZIP into SOURCE_DIR
-    shutil.unpack_archive(ZIP_PATH, SOURCE_DIR)
+    # Read the PDFs straight out of the ZIP and write each one once, into
+    # uploads/ (the copy the Flask app serves), instead of unpacking
+    # everything into a temp folder and copying it again from there.
+    # Builds a sorted list of (original name, path in uploads/) pairs
+    print(f"Reading {ZIP_PATH}...")
+    pdfs = []
+    with zipfile.ZipFile(ZIP_PATH) as z:
+        for info in sorted(z.infolist(), key=lambda info: info.filename):
+            name = info.filename
+            # Only top-level PDFs (skip folders and anything nested in them)
+            if info.is_dir() or "/" in name or not name.lower().endswith(".pdf"):
+                continue
+
+            # Use a safe filename (no weird characters) in uploads/
+            dest_path = os.path.join(UPLOAD_DIR, secure_filename(name))
+            with z.open(info) as src, open(dest_path, "wb") as dest:
+                shutil.copyfileobj(src, dest)
+
+            pdfs.append((name, dest_path))
 
-    # Get a sorted list of files in the unpacked directory
-    files = sorted(os.listdir(SOURCE_DIR))
     imported = 0
 
-    for name in files:
-        # Skip non-PDFs
-        if not name.lower().endswith(".pdf"):
-            continue
-
-        src_path = os.path.join(SOURCE_DIR, name)
-        if not os.path.isfile(src_path):
-            continue
-
-        print(f"Processing {name}...")
-
-        # Use a safe filename (no weird characters) when working locally
-        safe_name = secure_filename(name)
-        safe_src_path = os.path.join(SOURCE_DIR, safe_name)
-        if safe_src_path != src_path:
-            # If secure_filename changed the name, copy into new path
-            shutil.copy(src_path, safe_src_path)
-        else:
-            # Otherwise just use the original
-            safe_src_path = src_path
-
-        # Extract text + PDF metadata title
-        text, pdf_title = extract_text_and_title(safe_src_path)
-
-        # Guess candidate first and last name
-        first_name, last_name = guess_name_from_text(text, name)
-
-        # Guess job field from text + filename + title
-        job_field = guess_job_field(text, name, pdf_title)
-
-        # Build a base username from the sanitized filename
-        base_username = os.path.splitext(safe_name)[0].replace(" ", "").lower()
-        username = base_username
-
-        # Ensure username is unique in the DB by adding suffixes if needed
-        suffix = 1
-        while db.execute("SELECT id FROM users WHERE username = ?", username):
-            suffix += 1
-            username = f"{base_username}_{suffix}"
-
-        # Auto-generate email/phone/role/password for bulk-created candidates
-        email = f"{username}@example.com"
-        phone = "000-000-0000"
-        role = "candidate"
-        password_hash = generate_password_hash("placeholder-password")
-
-        # Insert a new candidate user
-        db.execute(
-            """
-            INSERT INTO users (username, hash, role, first_name, last_name, email, phone)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            username,
-            password_hash,
-            role,
-            first_name,
-            last_name,
-            email,
-            phone,
+    # Every bulk-created candidate gets the same placeholder password, so hash
+    # it once here instead of paying for the (deliberately slow) hash per file
+    password_hash = generate_password_hash("placeholder-password")
+
+    # Rows waiting to be inserted by insert_batch()
+    user_rows = []
+    resume_rows = []
+
+    # - a process pool extracts text + PDF metadata titles on every CPU core
+    #   at once, while this process does the inserts
+    # - plain sqlite3 (not CS50's helper) so we can batch inserts with
+    #   executemany and manage the transaction ourselves
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool, \
+            closing(sqlite3.connect(DB_PATH, isolation_level=None)) as conn:
+        # Same WAL mode as app.py; NORMAL sync + in-memory temp storage are
+        # safe with WAL and make commits cheaper
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+        # Load every username already taken once up front, so picking unique
+        # usernames below is an in-memory set lookup instead of a query per try
+        existing_usernames = {
+            row[0] for row in conn.execute("SELECT username FROM users")
+        }
+
+        # map() hands extraction results back in file order
+        extracted = pool.map(
+            extract_text_and_title, [path for _, path in pdfs], chunksize=8
         )
 
-        # Fetch the new user’s id
-        user_row = db.execute("SELECT id FROM users WHERE username = ?", username)[0]
-        user_id = user_row["id"]
-
-        # Copy the original PDF into uploads/ so the Flask app can embed it
-        dest_filename = secure_filename(name)
-        dest_path = os.path.join(UPLOAD_DIR, dest_filename)
-        shutil.copy(src_path, dest_path)
-
-        # Insert resume row with text + job_field
-        db.execute(
-            """
-            INSERT INTO resumes (user_id, filename, text, job_field)
-            VALUES (?, ?, ?, ?)
-            """,
-            user_id,
-            dest_filename,
-            text,
-            job_field,
-        )
-
-        imported += 1
-        print(
-            f"Imported resume for {first_name} {last_name} "
-            f"as user '{username}' (field: {job_field})."
-        )
+        conn.execute("BEGIN")
+        try:
+            for (name, dest_path), (text, pdf_title) in zip(pdfs, extracted):
+                print(f"Processing {name}...")
+                safe_name = secure_filename(name)
+
+                # Guess candidate first and last name
+                first_name, last_name = guess_name_from_text(text, name)
+
+                # Guess job field from text + filename + title
+                job_field = guess_job_field(text, name, pdf_title)
+
+                # Store only the words the ML model uses (the guesses above
+                # needed the full text); if we couldn't get any, a placeholder
+                text = compact_text(text) or "(No text could be extracted from this PDF.)"
+
+                # Build a base username from the sanitized filename
+                base_username = os.path.splitext(safe_name)[0].replace(" ", "").lower()
+                username = base_username
+
+                # Ensure username is unique (in the DB and among the resumes
+                # imported so far) by adding suffixes if needed
+                suffix = 1
+                while username in existing_usernames:
+                    suffix += 1
+                    username = f"{base_username}_{suffix}"
+                existing_usernames.add(username)
+
+                # Auto-generate email/phone/role/password for bulk-created candidates
+                email = f"{username}@example.com"
+                phone = "000-000-0000"
+                role = "candidate"
+
+                # Queue a new candidate user + their resume row (text + job_field)
+                user_rows.append(
+                    (username, password_hash, role, first_name, last_name, email, phone)
+                )
+                resume_rows.append(
+                    (safe_name, text, job_field, hashlib.sha256(text.encode()).hexdigest())
+                )
+
+                imported += 1
+                print(
+                    f"Imported resume for {first_name} {last_name} "
+                    f"as user '{username}' (field: {job_field})."
+                )
+
+                # Flush a full batch and commit it
+                if len(user_rows) >= BATCH_SIZE:
+                    insert_batch(conn, user_rows, resume_rows)
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN")
+                    user_rows.clear()
+                    resume_rows.clear()
+
+            # Insert whatever is left over
+            insert_batch(conn, user_rows, resume_rows)
+        except Exception:
+            # Undo the unfinished batch; earlier batches stay imported
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
     print(f"Done. Imported {imported} resumes.")
 
@@ -0,0 +1,24 @@
+# Gunicorn settings for serving ResumeMash outside of the Flask dev server.
+#
+# Run from the project directory with:
+#     gunicorn app:app
+#
+# - one worker process per CPU core (each one sets up the database on import,
+#   taking turns through a lock file, so they can all boot at once)
+# - each worker handles requests on several threads, so a slow upload or
+#   model retrain doesn't hold up logins, swipes, or feedback pages
+# - each worker also has its own pool of PDF parsing processes; the cores are
+#   split between them (at least one parser each) so the workers together
+#   don't start more parsers than there are cores. Set RESUMEMASH_PARSE_WORKERS
+#   yourself to change that, e.g. more parsers per worker if uploads are the
+#   bottleneck, at the cost of extra processes and memory.
+import multiprocessing
+import os
+
+bind = "0.0.0.0:8000"
+worker_class = "gthread"
+workers = multiprocessing.cpu_count()
+threads = 8
+
+# Read by app.py in each worker when it creates its parsing pool
+os.environ.setdefault("RESUMEMASH_PARSE_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
@@ -1,14 +1,28 @@
+import fcntl
 import os
-import pickle
+import tempfile
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
 
 # Directory to store per-field models on disk.
 # Each job_field gets its own model file inside this folder.
 MODEL_DIR = "models"
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Permissions for new model files: what open() would give them (0o666 minus
+# the umask). Python can only read the umask by setting it, so do that once
+# here at import instead of while other threads might be creating files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+MODEL_FILE_MODE = 0o666 & ~_UMASK
+
+# Models loaded for scoring in this process: job_field -> (version, bundle).
+# Holds one bundle per field, replaced whenever that field's model changes.
+_BUNDLES = {}
+
 
 def _model_path(job_field: str) -> str:
     """
@@ -23,9 +37,63 @@ def _model_path(job_field: str) -> str:
     return os.path.join(MODEL_DIR, f"model_{safe}.pkl")
 
 
+def model_version(job_field):
+    """
+    Return a version stamp for the saved model of a given job_field.
+
+    The stamp is the model file's modification time in nanoseconds, so it
+    changes every time train_model() rewrites the file (even from another
+    process).
+
+    Returns:
+        int, or None if no model has been trained for this field yet.
+    """
+    try:
+        return os.stat(_model_path(job_field)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _make_vectorizer():
+    """
+    Build the text -> features step shared by training and scoring.
+
+    HashingVectorizer has no fitted vocabulary (each word is hashed straight
+    to a column), so new swipes can be added to a model without refitting it.
+    - stop_words="english" removes common English words
+    - alternate_sign=False keeps every feature value non-negative
+    """
+    return HashingVectorizer(
+        stop_words="english",
+        n_features=2**18,
+        alternate_sign=False,
+    )
+
+
+# The vectorizer's own text -> words step (lowercase, split into words,
+# drop English stop words and one-letter words)
+_ANALYZER = _make_vectorizer().build_analyzer()
+
+
+def compact_text(text):
+    """
+    Shrink resume text down to just the words the model looks at.
+
+    Stored resume text is only used for training and scoring, so keeping
+    stop words, punctuation, and line breaks in the database is wasted
+    space. The model sees exactly the same words in the compact text as in
+    the original, so scores don't change.
+
+    Returns:
+        the words joined by single spaces ("" if no words are left).
+    """
+    return " ".join(_ANALYZER(text))
+
+
 def train_model(db, job_field):
     """
-    Train a logistic regression model on all swipes for a given job_field.
+    Update the logistic regression model for a given job_field with any
+    swipes it hasn't learned from yet.
 
     Inputs:
         db        - CS50 SQL database connection
@@ -35,114 +103,235 @@ def train_model(db, job_field):
         X = resume text (from resumes.text)
         y = swipe label (from swipes.label, 0 = Pass, 1 = Mash)
 
+    Swipes are only ever added, so the saved model remembers the id of the
+    last swipe it was trained on and each call only reads newer swipes.
+    The first call (or one after the model file is deleted) reads them all.
+
     Side effect:
-        Saves vectorizer + model as a single pickle file:
+        Saves vectorizer + model (+ training progress) as a single joblib file:
             MODEL_DIR/model_<job_field>.pkl
 
     Returns:
-        number of swipe samples used for training (int)
+        number of new swipe samples used for training (int)
+    """
+    # Several app processes can retrain the same field at once. A per-field
+    # lock file makes them take turns, so each one starts from the checkpoint
+    # the previous one saved instead of overwriting it. (The lock is released
+    # when the file is closed.)
+    with open(f"{_model_path(job_field)}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _update_model(db, job_field)
+
+
+def _update_model(db, job_field):
     """
-    # Pull all swipes for this field, joined with the resume text.
+    Worker side of train_model(), run while holding the field's lock.
+    """
+    # Pick up where the saved model left off. Older model files (trained
+    # from scratch with TF-IDF) have no checkpoint, so start over from them.
+    path = _model_path(job_field)
+    bundle = None
+    if os.path.exists(path):
+        # Load our own copy (not the memory-mapped, cached one used for
+        # scoring), since partial_fit() updates the model in place
+        bundle = joblib.load(path)
+        if "last_swipe_id" not in bundle:
+            bundle = None
+
+    last_swipe_id = bundle["last_swipe_id"] if bundle else 0
+
+    # Pull every new swipe for this field (just ids and labels, oldest first)
+    # in a single query (never one query per swipe/resume), then hand the
+    # whole batch to scikit-learn at once.
     rows = db.execute(
         """
-        SELECT resumes.text AS text, swipes.label AS label
+        SELECT swipes.id AS id, swipes.resume_id AS resume_id, swipes.label AS label
         FROM swipes
         JOIN resumes ON swipes.resume_id = resumes.id
-        WHERE resumes.job_field = ?
+        WHERE resumes.job_field = ? AND swipes.id > ?
+        ORDER BY swipes.id
         """,
         job_field,
+        last_swipe_id,
     )
 
     if not rows:
-        # Nothing to train on for this field yet.
+        # Nothing new to train on for this field yet.
         return 0
 
-    # Split query results into features and labels.
-    texts = [row["text"] for row in rows]
+    # Fetch the text of each swiped resume only once, even if several
+    # recruiters swiped on it, with a second query.
+    resumes = db.execute(
+        """
+        SELECT id, text
+        FROM resumes
+        WHERE job_field = ?
+          AND id IN (SELECT resume_id FROM swipes WHERE id > ? AND id <= ?)
+        """,
+        job_field,
+        last_swipe_id,
+        rows[-1]["id"],
+    )
+
+    # Split query results into features (one text per distinct resume,
+    # plus which of those texts each swipe uses) and labels.
+    texts = [resume["text"] for resume in resumes]
+    position = {resume["id"]: i for i, resume in enumerate(resumes)}
+    text_index = [position[row["resume_id"]] for row in rows]
     labels = [row["label"] for row in rows]
 
-    # Guard: need at least 2 different classes (both 0 and 1) or LogisticRegression
-    # will crash with "needs samples of at least 2 classes".
-    if len(set(labels)) < 2:
+    # Guard: a brand-new model needs at least 2 different classes (both 0 and 1),
+    # or it would just learn to always give the one answer it has seen.
+    if bundle is None and len(set(labels)) < 2:
         print(
             f"[ML] Not training model for '{job_field}' yet: "
             f"only one class present in {len(labels)} samples."
         )
-        # If a model already exists on disk, we keep it.
-        # We just skip updating it until we have more balanced data.
+        # We don't save a checkpoint, so these swipes are used again
+        # once we have more balanced data.
         return 0
 
-    # Convert text into numeric features using TF-IDF.
-    # - stop_words="english" removes common English words
-    # - max_features limits vocabulary size to keep model small/simple
-    vectorizer = TfidfVectorizer(
-        stop_words="english",
-        max_features=5000,
-    )
-    X = vectorizer.fit_transform(texts)
-
-    # Logistic regression classifier.
-    # - max_iter increased so training converges on small datasets.
-    # - class_weight="balanced" helps when Pass vs Mash counts are imbalanced.
-    model = LogisticRegression(
-        max_iter=1000,
-        class_weight="balanced",
+    if bundle is None:
+        # Logistic regression trained by stochastic gradient descent, which
+        # can keep learning from new batches with partial_fit().
+        bundle = {
+            "vectorizer": _make_vectorizer(),
+            "model": SGDClassifier(loss="log_loss"),
+            "class_counts": [0, 0],
+        }
+
+    vectorizer = bundle["vectorizer"]
+    model = bundle["model"]
+
+    # Weight each class by how rare it is across every swipe seen so far
+    # (same idea as class_weight="balanced"), so an imbalanced Pass vs Mash
+    # count doesn't swamp the model.
+    class_counts = bundle["class_counts"]
+    for label in labels:
+        class_counts[label] += 1
+    total = sum(class_counts)
+    weights = [total / (2 * max(n, 1)) for n in class_counts]
+
+    # Vectorize each distinct resume once, then repeat its row for every swipe
+    X = vectorizer.transform(texts)[text_index]
+    model.partial_fit(
+        X,
+        labels,
+        classes=[0, 1],
+        sample_weight=[weights[label] for label in labels],
     )
-    model.fit(X, labels)
+    bundle["last_swipe_id"] = rows[-1]["id"]
 
-    # Bundle both the vectorizer and the trained model together so we can
-    # reload them later with a single file read.
-    bundle = {"vectorizer": vectorizer, "model": model}
-    path = _model_path(job_field)
-    with open(path, "wb") as f:
-        pickle.dump(bundle, f)
+    # Write to a temp file and swap it in, so score_text() running on another
+    # thread never reads a half-written model. The temp file gets a unique
+    # name, so no other writer can ever be writing to the same file.
+    # joblib stores the NumPy arrays uncompressed so they can be memory-mapped
+    # when loaded. mkstemp makes the file private to us (0600), so set the
+    # usual permissions before it replaces the model, or other users (e.g.
+    # a web server running as someone else) couldn't read it anymore.
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(bundle, tmp_path, compress=0)
+        os.chmod(tmp_path, MODEL_FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    # Let go of the old model now rather than on the next score
+    _BUNDLES.pop(job_field, None)
 
-    # Return how many training samples we had for this field.
-    return len(texts)
+    # Return how many new training samples we had for this field.
+    return len(labels)
 
 
 def _load_model_bundle(job_field):
     """
     Load the saved vectorizer + model for a given job_field, if it exists.
 
+    The model's NumPy arrays are memory-mapped read-only rather than copied
+    into RAM, so every worker process shares one copy through the OS page
+    cache.
+
+    Loaded bundles are kept in _BUNDLES, so each model file is only read
+    from disk once; when train_model() rewrites the file its version changes
+    and the next call loads the new one in place of the old one.
+
     Returns:
         dict with keys "vectorizer" and "model", or None if no file yet.
     """
-    path = _model_path(job_field)
-    if not os.path.exists(path):
+    version = model_version(job_field)
+    if version is None:
         # No model trained for this field yet.
+        _BUNDLES.pop(job_field, None)
         return None
 
-    with open(path, "rb") as f:
-        return pickle.load(f)
+    cached = _BUNDLES.get(job_field)
+    if cached is not None and cached[0] == version:
+        return cached[1]
 
+    bundle = joblib.load(_model_path(job_field), mmap_mode="r")
+    _BUNDLES[job_field] = (version, bundle)
+    return bundle
 
-def score_text(text, job_field):
+
+def score_texts(texts, job_field):
     """
-    Given resume text and a job_field, run the trained model (if any)
-    and return the probability that the model predicts "Mash" (label 1).
+    Score many resumes for the same job_field in one batch.
+
+    The vectorizer and model run once over all texts together, which is much
+    faster than calling score_text() once per resume.
 
     Inputs:
-        text      - plain text of a single resume
+        texts     - list of plain-text resumes
         job_field - which per-field model to use, e.g. "software"
 
     Returns:
-        float in [0, 1] = P(label == 1 | text, job_field),
-        or None if no trained model exists for this field yet.
+        list of floats in [0, 1] (one P(label == 1) per text, same order),
+        or a list of None if no trained model exists for this field yet.
     """
     bundle = _load_model_bundle(job_field)
     if bundle is None:
         # No model file on disk for this field.
-        return None
+        return [None] * len(texts)
+    if not texts:
+        return []
 
     vectorizer = bundle["vectorizer"]
+
+    # Transform every resume string into the same feature space
+    # that the model was trained on (one row per resume).
+    X = vectorizer.transform(texts)
+
     model = bundle["model"]
 
-    # Transform the single resume string into the same TF-IDF space
-    # that the model was trained on.
-    X = vectorizer.transform([text])
+    if "last_swipe_id" not in bundle:
+        # Older (TF-IDF) model files: let scikit-learn score them.
+        # predict_proba returns one [P(class 0), P(class 1)] row per resume.
+        # Column 1 is the probability of "Mash".
+        return model.predict_proba(X)[:, 1].tolist()
+
+    # Logistic regression is just sigmoid(weights · features + intercept):
+    # one sparse dot product per resume, without scikit-learn's
+    # predict_proba checks and copies. The weights are read straight from
+    # the model's memory-mapped coef_ (already float64, like the features).
+    # 1 / (1 + e^-z) is written as e^-log(1 + e^-z) so very large scores
+    # can't overflow.
+    z = X @ model.coef_[0] + model.intercept_[0]
+    return np.exp(-np.logaddexp(0, -z)).tolist()
 
-    # predict_proba returns an array of [P(class 0), P(class 1)].
-    # Index 1 is the probability of "Mash".
-    prob = model.predict_proba(X)[0][1]
-    return prob
+
+def score_text(text, job_field):
+    """
+    Given resume text and a job_field, run the trained model (if any)
+    and return the probability that the model predicts "Mash" (label 1).
+
+    Inputs:
+        text      - plain text of a single resume
+        job_field - which per-field model to use, e.g. "software"
+
+    Returns:
+        float in [0, 1] = P(label == 1 | text, job_field),
+        or None if no trained model exists for this field yet.
+    """
+    return score_texts([text], job_field)[0]
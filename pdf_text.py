@@ -0,0 +1,45 @@
+import io
+
+import pymupdf
+
+# Stop extracting PDF text after this many characters; real resumes are far
+# shorter, and it bounds the work a huge upload can cause
+MAX_RESUME_TEXT = 200_000
+
+
+def extract_pdf_text(path):
+    """
+    Extract the plain text of a PDF using PyMuPDF.
+
+    This lives in its own small module (no Flask or database setup on import)
+    so app.py can run it in worker processes.
+
+    Inputs:
+        path - path to a PDF file on disk
+
+    Returns:
+        text of the pages, joined with newlines and stripped. Stops after the
+        page that pushes the total past MAX_RESUME_TEXT characters.
+    """
+    return extract_pdf_text_and_title(path)[0]
+
+
+def extract_pdf_text_and_title(path):
+    """
+    Like extract_pdf_text(), but also return the PDF's metadata title.
+
+    The bulk importer uses the title to help guess the job field.
+
+    Returns:
+        (text, title), with title "" if the PDF doesn't have one
+    """
+    # PyMuPDF does the parsing in C, which is much faster than PyPDF2
+    buf = io.StringIO()
+    with pymupdf.open(path) as doc:
+        for page in doc:
+            buf.write(page.get_text("text"))
+            buf.write("\n")
+            if buf.tell() > MAX_RESUME_TEXT:
+                break
+        title = (doc.metadata or {}).get("title") or ""
+    return buf.getvalue().strip(), title